@@ -0,0 +1,66 @@
+""" Verificación y tiempos de remuestreo.bootstrap con ingresos faltantes
+
+Sobre una encuesta sintética (la de benchmarks/suite.py) con una proporción de ingresos
+faltantes (NaN), compara réplica por réplica quintile_ratio y gini_of con el cálculo
+directo sobre cada columna de ponderadores: ratq51 del capítulo 3, que descarta los
+faltantes, y desigualdad.inequality sobre la base sin faltantes. Luego mide el bootstrap
+completo y verifica que los errores estándar sean finitos. Termina con error si alguna
+verificación falla.
+
+Uso: python benchmarks/bootstrap_check.py --rows 400000 --reps 1000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from suite import SECTIONS, notebook_function, survey
+
+sys.path.insert(0, SECTIONS)
+import desigualdad  # noqa: E402
+import remuestreo  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=400_000)
+    parser.add_argument('--reps', type=int, default=1000)
+    parser.add_argument('--compare', type=int, default=10, help='réplicas comparadas con el cálculo directo')
+    parser.add_argument('--missing', type=float, default=0.01, help='proporción de ingresos faltantes')
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ratq51 = notebook_function('capitulo3.ipynb', 'ratq51')
+    rng = np.random.default_rng(args.seed)
+    df = survey(args.rows, rng)
+    df.loc[rng.random(len(df)) < args.missing, 'ipcf'] = np.nan
+    W = remuestreo.replicate_weights(df, 'pondera', cluster='id', reps=args.compare, seed=args.seed)
+
+    def directo(nombre, j):
+        base = df.assign(w=W[:, j])
+        if nombre == 'quintile_ratio':
+            return ratq51(base, x='ipcf', weight='w')
+        return desigualdad.inequality(base.dropna(subset=['ipcf']), 'ipcf', weight='w')['gini'].iloc[0]
+
+    fallas = []
+    for nombre in ('quintile_ratio', 'gini_of'):
+        estadistico = getattr(remuestreo, nombre)('ipcf')
+        esperado = np.array([directo(nombre, j) for j in range(args.compare)])
+        diferencia = np.max(np.abs(estadistico(df, W)/esperado - 1))
+        t = time.perf_counter()
+        res = remuestreo.bootstrap(df, estadistico, 'pondera', cluster='id', reps=args.reps, seed=args.seed)
+        segundos = time.perf_counter() - t
+        ok = diferencia <= args.tolerance and np.isfinite(res[['estimacion', 'error_estandar']]).all()
+        print(f"{'ok   ' if ok else 'FALLA'} {nombre}: diferencia relativa máxima {diferencia:.2e}, "
+              f"error estándar {res['error_estandar']:.6g}; {args.reps} réplicas de {args.rows:,} filas "
+              f'en {segundos:.1f}s')
+        if not ok:
+            fallas.append(nombre)
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+""" Verificación del caché y del cargador concurrente de datos.py contra un servidor local
+
+Levanta un servidor http.server en 127.0.0.1 que reemplaza a Google Drive y sirve bases .dta
+sintéticas, con una demora fija por pedido. Con ese servidor se verifica que:
+- read_surveys descarga varias bases a la vez sin superar workers pedidos simultáneos y sin
+  iniciar descargas más seguido de lo que permite el TokenBucket (rate y capacity);
+- el caché devuelve las mismas bases sin conexión y sin nuevos pedidos, detecta un archivo
+  alterado con verify=True y vuelve a descargarlo;
+- un 404, una descarga cortada y una página html en lugar de la base fallan sin dejar
+  archivos parciales ni entradas en el índice.
+No usa internet. Termina con error si alguna verificación falla.
+
+Uso: python benchmarks/loader_check.py --surveys 8 --workers 4 --rate 10
+"""
+import argparse
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sections'))
+import datos  # noqa: E402
+
+
+class Servidor(http.server.ThreadingHTTPServer):
+    """ servidor que responde /<id> con el archivo archivos[id] y registra cada pedido """
+    daemon_threads = True
+
+    def __init__(self, archivos, demora):
+        super().__init__(('127.0.0.1', 0), Pedido)
+        self.archivos = archivos
+        self.demora = demora
+        self.pedidos = []
+        self.activos = 0
+        self.maximo = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+
+class Pedido(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        servidor = self.server
+        with servidor.lock:
+            servidor.pedidos.append((self.path[1:], time.monotonic()))
+            servidor.activos += 1
+            servidor.maximo = max(servidor.maximo, servidor.activos)
+        try:
+            time.sleep(servidor.demora)
+            contenido = servidor.archivos.get(self.path[1:])
+            if contenido is None:
+                self.send_error(404)
+                return
+            cortado = self.path.startswith('/cortado')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(contenido)))
+            self.end_headers()
+            # una descarga cortada anuncia el tamaño completo pero envía sólo la mitad
+            self.wfile.write(contenido[:len(contenido)//2] if cortado else contenido)
+        finally:
+            with servidor.lock:
+                servidor.activos -= 1
+
+
+def base_dta(directorio, nombre, filas, rng):
+    """ bytes de una base .dta sintética con id, ipcf y pondera """
+    ruta = os.path.join(directorio, f'{nombre}.dta')
+    pd.DataFrame({'id': np.repeat(np.arange(filas//3 + 1), 3)[:filas],
+                  'ipcf': rng.lognormal(7, 1, filas),
+                  'pondera': rng.integers(50, 500, filas)}).to_stata(ruta, write_index=False)
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+
+def verificar(condicion, mensaje, fallas):
+    print(f"{'ok   ' if condicion else 'FALLA'} {mensaje}")
+    if not condicion:
+        fallas.append(mensaje)
+
+
+def sin_rastros(cache):
+    """ el caché no tiene descargas parciales """
+    return not [f for f in os.listdir(cache) if f.endswith('.part')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--surveys', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=10.0)
+    parser.add_argument('--capacity', type=int, default=1)
+    parser.add_argument('--delay', type=float, default=0.5, help='demora del servidor por pedido, en segundos')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    fallas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        archivos = {f'id{i}': base_dta(tmp, f'base{i}', args.rows, rng) for i in range(args.surveys)}
+        archivos['html'] = b'<!DOCTYPE html><html><head><title>Google Drive - Virus scan warning</title></html>'
+        archivos['cortado'] = archivos['id0']
+        catalogo = {f'pais{i}_06': f'id{i}' for i in range(args.surveys)}
+        cache = os.path.join(tmp, 'cache')
+
+        servidor = Servidor(archivos, args.delay)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            # descarga concurrente con límite de velocidad
+            t = time.monotonic()
+            bases = datos.read_surveys(catalogo, path=cache, offline=False, workers=args.workers,
+                                       rate=args.rate, capacity=args.capacity, url=servidor.url)
+            total = time.monotonic() - t
+            inicios = np.sort([momento for _, momento in servidor.pedidos])
+            # con capacity fichas en ráfaga, la descarga k empieza después de (k - capacity)/rate
+            minimos = np.maximum(np.arange(len(inicios)) - args.capacity + 1, 0)/args.rate
+            verificar(len(servidor.pedidos) == args.surveys, f'{args.surveys} bases, un pedido por base', fallas)
+            verificar(list(bases) == list(catalogo), 'las bases vuelven en el orden del catálogo', fallas)
+            verificar(servidor.maximo <= args.workers,
+                      f'a lo sumo {args.workers} descargas simultáneas (máximo observado {servidor.maximo})', fallas)
+            verificar(args.workers == 1 or args.delay*args.rate <= 1 or servidor.maximo > 1,
+                      'las descargas se superponen', fallas)
+            verificar(np.all(inicios - inicios[0] >= minimos - 0.02),
+                      f'el TokenBucket separa los inicios al menos 1/rate = {1/args.rate:.3f}s', fallas)
+            print(f'      {args.surveys} descargas en {total:.2f}s (secuencial con pausas: '
+                  f'{args.surveys*(args.delay + 1/args.rate):.2f}s)')
+
+            # ida y vuelta por el caché, sin conexión
+            servidor.pedidos.clear()
+            t = time.monotonic()
+            de_nuevo = datos.read_surveys(catalogo, path=cache, offline=True, url=servidor.url)
+            verificar(not servidor.pedidos, f'sin conexión no hay pedidos ({time.monotonic() - t:.3f}s)', fallas)
+            verificar(all(de_nuevo[k].equals(bases[k]) for k in catalogo), 'el caché devuelve las mismas bases', fallas)
+            ruta = datos.cached_path('pais0_06', cache)
+            verificar(ruta is not None and datos.sha256(ruta) == os.path.basename(ruta)[:-4],
+                      'cada archivo se guarda con el nombre de su SHA-256', fallas)
+            verificar(datos.cached_path('pais0_06', cache, verify=True) == ruta, 'verify=True acepta la copia', fallas)
+            with open(ruta, 'r+b') as f:
+                f.seek(-1, os.SEEK_END)
+                ultimo = f.read(1)
+                f.seek(-1, os.SEEK_END)
+                f.write(bytes([ultimo[0] ^ 0xFF]))
+            verificar(datos.cached_path('pais0_06', cache, verify=True) is None,
+                      'verify=True detecta un archivo alterado', fallas)
+            datos.fetch_dta('pais0_06', 'id0', path=cache, offline=False, url=servidor.url, verify=True)
+            verificar(datos.cached_path('pais0_06', cache, verify=True) == ruta and len(servidor.pedidos) == 1,
+                      'el archivo alterado se vuelve a descargar', fallas)
+
+            # errores: nada queda registrado
+            for nombre, file_id, error in [('no_existe', 'falta', urllib.error.HTTPError),
+                                           ('cortado', 'cortado', urllib.error.ContentTooShortError),
+                                           ('html', 'html', ValueError)]:
+                try:
+                    datos.fetch_dta(nombre, file_id, path=cache, offline=False, url=servidor.url)
+                    fallo = None
+                except Exception as e:
+                    fallo = e
+                verificar(isinstance(fallo, error) and datos.cached_path(nombre, cache) is None and sin_rastros(cache),
+                          f'{nombre}: falla con {type(fallo).__name__} sin dejar archivos en el caché', fallas)
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
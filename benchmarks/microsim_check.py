@@ -0,0 +1,75 @@
+""" Verificación de microsimulacion.simulate frente al bucle original del capítulo 3
+
+Arma encuestas sintéticas (las de benchmarks/suite.py) para varios países y calcula el
+cociente de quintiles tras el impuesto-transferencia con microsimulacion.simulate y con el
+bucle que tenía el notebook (ratq51 sobre ipcf_star, una alícuota y un país a la vez).
+Repite la comparación con ingresos faltantes (NaN), que ratq51 descarta. Reporta tiempos
+y termina con error si algún cociente difiere más que --tolerance.
+
+Uso: python benchmarks/microsim_check.py --rows 200000 --countries 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from suite import SECTIONS, notebook_function, survey
+
+sys.path.insert(0, SECTIONS)
+import microsimulacion  # noqa: E402
+
+
+def loop_ratios(catalog, rates, ratq51):
+    """ cociente de quintiles para cada país y alícuota, como el bucle original del notebook """
+    resultados = {}
+    for ty in rates:
+        for name, df in catalog.items():
+            df = df.sort_values(by=['id'], kind='stable').reset_index()
+            df['tag_hogar'] = df.groupby('id').cumcount() == 0
+            df['impuesto'] = df['ipcf']*ty
+            df['subsidio'] = df.groupby(['id']).impuesto.transform('sum')
+            df.loc[df['tag_hogar'] != True, 'subsidio'] = 0  # noqa: E712
+            df['ipcf_star'] = df['ipcf'] - df['impuesto'] + df['subsidio']
+            resultados[(name, ty)] = ratq51(data=df, x='ipcf_star', weight='pondera')
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--countries', type=int, default=4)
+    parser.add_argument('--rates', type=float, nargs='+', default=[0, 0.1, 0.2, 0.3])
+    parser.add_argument('--missing', type=float, default=0.01, help='proporción de ingresos faltantes')
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ratq51 = notebook_function('capitulo3.ipynb', 'ratq51')
+    rng = np.random.default_rng(args.seed)
+    catalogo = {f'pais{i}': survey(args.rows, rng) for i in range(args.countries)}
+    fallas = []
+    for caso in ('sin faltantes', 'con faltantes'):
+        if caso == 'con faltantes':
+            for df in catalogo.values():
+                df.loc[rng.random(len(df)) < args.missing, 'ipcf'] = np.nan
+        t = time.perf_counter()
+        esperado = loop_ratios(catalogo, args.rates, ratq51)
+        t_bucle = time.perf_counter() - t
+        t = time.perf_counter()
+        resultado = microsimulacion.simulate(catalogo, args.rates)
+        t_simulate = time.perf_counter() - t
+        obtenido = {(r.pais, r.alicuota): r.ratq51 for r in resultado.itertuples()}
+        diferencia = max(abs(obtenido[k]/v - 1) for k, v in esperado.items())
+        ok = np.isfinite(list(obtenido.values())).all() and diferencia <= args.tolerance
+        print(f"{'ok   ' if ok else 'FALLA'} {caso}: diferencia relativa máxima {diferencia:.2e}; "
+              f'bucle {t_bucle:.2f}s, simulate {t_simulate:.2f}s')
+        if not ok:
+            fallas.append(caso)
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+""" Precisión y velocidad de WeightedSketch frente al cálculo exacto con np.interp
+
+Genera ingresos log-normales con ponderadores enteros, calcula cuartiles, cortes de
+quintiles y percentiles de forma exacta (weighted_quantiles) y con el resumen, armado
+de una vez o por bloques combinados, y reporta tiempos y error de rango.
+
+Uso: python benchmarks/sketch_accuracy.py --rows 1000000 --chunks 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sections'))
+import distribucion as dist  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--compression', type=int, nargs='+', default=[200, 1000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    x = rng.lognormal(6, 1, args.rows)
+    w = rng.integers(50, 500, args.rows).astype(float)
+    q = np.concatenate([[0.25, 0.5, 0.75], np.arange(1, 5)/5, np.arange(1, 100)/100])
+
+    t = time.perf_counter()
+    exacto = dist.weighted_quantiles(x, q, weights=w)
+    t_exacto = time.perf_counter() - t
+    valores, pesos = dist.weighted_sort(x, w)[:2]
+    acumulado = np.cumsum(pesos)/pesos.sum()
+    print(f'exacto (np.interp): {t_exacto:.3f}s para {args.rows:,} filas')
+
+    for compression in args.compression:
+        t = time.perf_counter()
+        entero = dist.WeightedSketch(compression).update(x, w)
+        t_entero = time.perf_counter() - t
+        t = time.perf_counter()
+        partes = [dist.WeightedSketch(compression).update(b, p)
+                  for b, p in zip(np.array_split(x, args.chunks), np.array_split(w, args.chunks))]
+        combinado = dist.WeightedSketch.combine(partes)
+        t_combinado = time.perf_counter() - t
+        for nombre, sketch, tiempo in [('entero', entero, t_entero), (f'{args.chunks} bloques', combinado, t_combinado)]:
+            estimado = sketch.quantile(q)
+            error = np.abs(np.interp(estimado, valores, acumulado) - q)
+            print(f'compression={compression:5d} {nombre:>10}: {tiempo:.3f}s, '
+                  f'{len(sketch.means)} centroides, error de rango máximo {error.max():.5f} '
+                  f'(cota {sketch.rank_error(q).max():.5f}), error relativo máximo '
+                  f'{np.max(np.abs(estimado/exacto - 1)):.4%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+""" Tiempo y memoria máxima de las rutinas distributivas de los capítulos 2 y 3
+
+Mide descriptive_stats, box_plotInput, ratq51 y gcuan (tomadas de los notebooks, tal como
+están definidas allí), la curva de Lorenz por región (dist.lorenz) y la curva de incidencia
+del crecimiento (dist.growth_incidence) sobre datos sintéticos: ingresos log-normales con
+una cola de Pareto en el 5% superior, un 3% de ingresos nulos, ponderadores enteros
+log-normales como pondera y hogares de 1 a 6 miembros. No descarga nada.
+El tiempo es el mejor de al menos --repeat ejecuciones; la memoria máxima se mide aparte con
+tracemalloc, para que el rastreo no afecte el tiempo. Con --save se guardan los resultados
+en un json y con --compare se los compara con uno anterior: el script termina con error si
+alguna rutina empeora más que --tolerance.
+
+Uso: python benchmarks/suite.py --rows 10000 1000000 10000000 --save base.json
+     python benchmarks/suite.py --rows 10000 1000000 --compare base.json
+"""
+import argparse
+import ast
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+SECTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sections')
+sys.path.insert(0, SECTIONS)
+import distribucion as dist  # noqa: E402
+
+
+def notebook_function(notebook, name):
+    """ define la función name tal como está en el notebook (sólo el def, sin el resto de la celda) """
+    with open(os.path.join(SECTIONS, notebook), encoding='utf-8') as f:
+        celdas = json.load(f)['cells']
+    for celda in celdas:
+        fuente = ''.join(celda['source'])
+        if celda['cell_type'] != 'code' or f'def {name}(' not in fuente:
+            continue
+        nodos = [n for n in ast.parse(fuente).body if isinstance(n, ast.FunctionDef) and n.name == name]
+        espacio = {'np': np, 'pd': pd, 'math': math, 'dist': dist}
+        exec(compile(ast.Module(nodos, type_ignores=[]), notebook, 'exec'), espacio)
+        return espacio[name]
+    raise LookupError(f'{name} no está definida en {notebook}')
+
+
+def survey(rows, rng, scale=1.0):
+    """ encuesta sintética con ipcf, pondera, id (hogar) y region """
+    ipcf = rng.lognormal(7, 0.9, rows)
+    # el 5% más rico sigue una Pareto con alfa 2.5 desde el percentil 95
+    cola = rng.random(rows) < 0.05
+    ipcf[cola] = np.exp(7 + 0.9*1.645)*(1 + rng.pareto(2.5, cola.sum()))
+    ipcf[rng.random(rows) < 0.03] = 0
+    miembros = rng.integers(1, 7, rows//3 + 1)
+    return pd.DataFrame({'ipcf': ipcf*scale,
+                         'pondera': np.clip(np.rint(rng.lognormal(5, 0.7, rows)), 1, 5000),
+                         'id': np.repeat(np.arange(len(miembros)), miembros)[:rows],
+                         'region': rng.integers(1, 7, rows)})
+
+
+def routines(df, df_b):
+    """ rutinas a medir, como funciones sin argumentos """
+    # como en el capítulo 2, la curva de incidencia se calcula sobre los ingresos positivos
+    pos_a, pos_b = df[df['ipcf'] > 0], df_b[df_b['ipcf'] > 0]
+    descriptive_stats = notebook_function('capitulo2.ipynb', 'descriptive_stats')
+    box_plotInput = notebook_function('capitulo2.ipynb', 'box_plotInput')
+    ratq51 = notebook_function('capitulo3.ipynb', 'ratq51')
+    gcuan = notebook_function('capitulo3.ipynb', 'gcuan')
+    return {
+        'descriptive_stats': lambda: descriptive_stats(df['ipcf'], df['pondera']),
+        'box_plotInput': lambda: box_plotInput(df['ipcf'], [5, 25, 50, 75, 95], weights=df['pondera']),
+        'ratq51': lambda: ratq51(df, x='ipcf', weight='pondera'),
+        'gcuan': lambda: gcuan(df['ipcf'], 10, df['pondera']),
+        'lorenz': lambda: dist.lorenz(df, 'ipcf', weight='pondera', by='region'),
+        'growth_incidence': lambda: dist.growth_incidence(pos_a, pos_b, n_quantiles=100),
+    }
+
+
+def measure(fn, repeat, min_time=0.2):
+    """ mejor tiempo (segundos) y memoria máxima de una ejecución (MB)
+    Se ejecuta al menos repeat veces y hasta acumular min_time segundos, para que el tiempo de
+    las rutinas rápidas no dependa del ruido de una sola ejecución.
+    """
+    tiempos = []
+    while len(tiempos) < repeat or sum(tiempos) < min_time:
+        t = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t)
+    tracemalloc.start()
+    try:
+        fn()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(tiempos), pico/2**20
+
+
+def compare(resultados, base, tolerance, slack=0.01):
+    """ rutinas cuyo tiempo o memoria superan a los de base en más de tolerance
+    Las diferencias menores que slack (segundos o MB) se ignoran: en las bases chicas son ruido.
+    """
+    anteriores = {(r['rutina'], r['filas']): r for r in base}
+    peores = []
+    for r in resultados:
+        previo = anteriores.get((r['rutina'], r['filas']))
+        if previo is None:
+            continue
+        for medida in ('segundos', 'memoria_mb'):
+            if r[medida] > previo[medida]*(1 + tolerance) + slack:
+                peores.append(f"{r['rutina']} ({r['filas']:,} filas): {medida} "
+                              f"{previo[medida]:.4f} -> {r[medida]:.4f}")
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--only', nargs='+', default=None, help='rutinas a medir (por defecto todas)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', default=None, help='json donde guardar los resultados')
+    parser.add_argument('--compare', default=None, help='json con resultados anteriores')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+
+    resultados = []
+    for rows in args.rows:
+        # misma semilla para cada tamaño: los datos son reproducibles
+        rng = np.random.default_rng(args.seed)
+        df, df_b = survey(rows, rng), survey(rows, rng, scale=1.1)
+        for nombre, fn in routines(df, df_b).items():
+            if args.only is not None and nombre not in args.only:
+                continue
+            segundos, memoria = measure(fn, args.repeat, args.min_time)
+            resultados.append({'rutina': nombre, 'filas': rows, 'segundos': segundos, 'memoria_mb': memoria})
+            print(f'{nombre:>18} {rows:>12,} filas: {segundos:9.4f}s, memoria máxima {memoria:9.1f} MB')
+        del df, df_b
+
+    if args.save is not None:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'numpy': np.__version__, 'pandas': pd.__version__, 'resultados': resultados}, f, indent=1)
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as f:
+            peores = compare(resultados, json.load(f)['resultados'], args.tolerance)
+        for linea in peores:
+            print(f'empeoró: {linea}')
+        if peores:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+""" Descarga y almacenamiento local de las bases de datos del apéndice
+
+Las encuestas se guardan en un caché local direccionado por contenido: cada
+archivo se almacena con el nombre de su hash SHA-256 y un índice en formato
+json vincula cada clave del catálogo (por ejemplo 'mexico_06') con ese hash. El hash se
+verifica al guardar cada archivo; al volver a usarlo, por defecto sólo se comparan su tamaño y
+su fecha de modificación (verify=True recalcula el hash). Al leer,
+un perfil de tipos (SCHEMA) permite guardar los códigos y el ponderador con tipos compactos.
+Para recorrer muchas bases, el almacén por columnas (open_surveys) guarda un archivo .npy por
+base y columna, que se abre mapeado en memoria sin leerlo.
+Se importa desde los notebooks con `import datos`.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DRIVE_URL = os.environ.get('APENDICE_DRIVE_URL', 'https://drive.google.com/uc?id=')
+
+# protege la lectura y escritura del índice cuando se descargan varias bases a la vez
+_LOCK = threading.Lock()
+
+# perfil de tipos para las bases del CEDLAS: 'code' son variables categóricas codificadas con
+# enteros chicos, 'weight' el factor de expansión e 'income' los ingresos, que se mantienen en float64
+SCHEMA = {'region': 'code', 'urbano': 'code', 'ocupado': 'code', 'sector': 'code', 'cohh': 'code',
+          'hombre': 'code', 'jefe': 'code', 'miembros': 'code', 'edad': 'code',
+          'pondera': 'weight',
+          'ipcf': 'income', 'itf': 'income', 'ila': 'income', 'ijubi': 'income', 'icap': 'income',
+          'itran': 'income', 'ionl': 'income'}
+
+
+def cache_dir(path=None):
+    """ directorio del caché local
+    :param path: directorio a utilizar; si es None se toma la variable de entorno
+                 APENDICE_CACHE_DIR o, en su defecto, ~/.cache/apendice_distribucion
+    :return: ruta absoluta del directorio (se crea si no existe)
+    """
+    if path is None:
+        path = os.environ.get('APENDICE_CACHE_DIR',
+                              os.path.join(os.path.expanduser('~'), '.cache', 'apendice_distribucion'))
+    path = os.path.abspath(path)
+    os.makedirs(os.path.join(path, 'objetos'), exist_ok=True)
+    return path
+
+
+def is_offline(offline=None):
+    """ indica si se trabaja sin conexión (argumento explícito o variable de entorno APENDICE_OFFLINE=1) """
+    if offline is None:
+        return os.environ.get('APENDICE_OFFLINE', '0') == '1'
+    return offline
+
+
+def sha256(path, bloque=2**20):
+    """ hash SHA-256 de un archivo leído por bloques """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _leer_indice(directorio):
+    ruta = os.path.join(directorio, 'indice.json')
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _guardar_indice(directorio, indice):
+    ruta = os.path.join(directorio, 'indice.json')
+    with tempfile.NamedTemporaryFile('w', dir=directorio, delete=False, encoding='utf-8') as f:
+        json.dump(indice, f, indent=1, sort_keys=True)
+    os.replace(f.name, ruta)
+
+
+# primer byte (versión) de los formatos binarios de Stata anteriores a la versión 13 (formato 117)
+_VERSIONES_DTA = {102, 103, 104, 105, 108, 110, 111, 113, 114, 115}
+
+
+def is_stata(ruta):
+    """ indica si un archivo tiene el encabezado de una base de Stata
+    Los formatos 117 en adelante empiezan con la etiqueta <stata_dta>; los anteriores con un byte
+    de versión, el orden de bytes (1 o 2) y el tipo de archivo (1).
+    """
+    with open(ruta, 'rb') as f:
+        inicio = f.read(11)
+    if inicio == b'<stata_dta>':
+        return True
+    return len(inicio) >= 3 and inicio[0] in _VERSIONES_DTA and inicio[1] in (1, 2) and inicio[2] == 1
+
+
+def _registrar(directorio, name, origen, file_id=None, mover=True):
+    """ copia (o mueve) un archivo al almacén de objetos y lo registra en el índice """
+    if not is_stata(origen):
+        # por ejemplo, la página html de confirmación o de cuota excedida de Google Drive
+        raise ValueError(f'{name}: {origen} no es una base de Stata (.dta); no se guarda en el caché')
+    digest = sha256(origen)
+    destino = os.path.join(directorio, 'objetos', f'{digest}.dta')
+    if mover:
+        # una descarga nueva reemplaza a la copia guardada, que pudo haberse dañado
+        os.replace(origen, destino)
+    elif not os.path.exists(destino):
+        shutil.copyfile(origen, destino)
+    with _LOCK:
+        indice = _leer_indice(directorio)
+        indice[name] = {'sha256': digest, 'id': file_id, **_firma(destino)}
+        _guardar_indice(directorio, indice)
+    return destino
+
+
+def _firma(ruta):
+    """ tamaño y fecha de modificación de un archivo, para validarlo sin volver a calcular su hash """
+    info = os.stat(ruta)
+    return {'bytes': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+
+def cached_path(name, path=None, verify=False):
+    """ ruta de una base ya presente en el caché
+    El hash SHA-256 se verifica siempre al registrar el archivo (después de cada descarga), pero
+    por defecto una copia ya guardada NO se vuelve a verificar contra él: sólo se compara su
+    tamaño y su fecha de modificación con los del índice, que detectan un archivo reemplazado o
+    truncado pero no un cambio que los conserve. El hash completo se recalcula con verify=True,
+    o cuando el tamaño o la fecha no coinciden.
+    :param name: clave del catálogo, por ejemplo 'mexico_06'
+    :param path: directorio del caché (ver cache_dir)
+    :param verify: si es True se vuelve a calcular el hash del archivo y se compara con el del índice
+    :return: ruta al archivo .dta o None si no está o no coincide con el índice
+    """
+    directorio = cache_dir(path)
+    entrada = _leer_indice(directorio).get(name)
+    if entrada is not None:
+        ruta = os.path.join(directorio, 'objetos', f"{entrada['sha256']}.dta")
+        if os.path.exists(ruta):
+            firma = _firma(ruta)
+            if not verify and all(entrada.get(k) == v for k, v in firma.items()):
+                return ruta
+            if sha256(ruta) == entrada['sha256']:
+                if any(entrada.get(k) != v for k, v in firma.items()):
+                    # entradas sin firma (o archivo tocado sin cambiar su contenido): se actualiza una vez
+                    with _LOCK:
+                        indice = _leer_indice(directorio)
+                        indice[name] = {**entrada, **firma}
+                        _guardar_indice(directorio, indice)
+                return ruta
+    # directorio pre-cargado a mano con archivos <name>.dta
+    sembrado = os.path.join(directorio, f'{name}.dta')
+    if os.path.exists(sembrado):
+        return _registrar(directorio, name, sembrado, mover=False)
+    return None
+
+
+def download(file_id, destino, url=DRIVE_URL):
+    """ descarga un archivo de Google Drive en destino
+    :param file_id: identificador del archivo en Google Drive
+    :param destino: ruta local donde se escribe el archivo
+    :param url: prefijo de la dirección de descarga
+    """
+    with urllib.request.urlopen(url + file_id) as r, open(destino, 'wb') as f:
+        shutil.copyfileobj(r, f)
+        # una conexión cortada no siempre produce un error: se compara con el tamaño anunciado
+        esperado = r.headers.get('Content-Length')
+        if esperado is not None and f.tell() != int(esperado):
+            raise urllib.error.ContentTooShortError(
+                f'descarga incompleta de {file_id}: {f.tell()} de {esperado} bytes', None)
+
+
+def fetch_dta(name, file_id, path=None, offline=None, limiter=None, url=DRIVE_URL, verify=False):
+    """ devuelve la ruta local de una base, descargándola sólo si no está en el caché
+    :param name: clave del catálogo, por ejemplo 'mexico_06'
+    :param file_id: identificador del archivo en Google Drive
+    :param path: directorio del caché (ver cache_dir)
+    :param offline: si es True nunca se descarga (por defecto se lee APENDICE_OFFLINE)
+    :param limiter: TokenBucket que se consulta antes de cada descarga (opcional)
+    :param url: prefijo de la dirección de descarga
+    :param verify: si es True se recalcula el hash de la copia guardada; por defecto sólo se
+                   comparan su tamaño y su fecha de modificación (ver cached_path)
+    :return: tupla con la ruta al archivo .dta y un booleano que indica si hubo descarga
+    """
+    ruta = cached_path(name, path, verify=verify)
+    if ruta is not None:
+        return ruta, False
+    if is_offline(offline):
+        raise FileNotFoundError(f'{name} no se encuentra en el caché {cache_dir(path)} y se trabaja sin conexión')
+    directorio = cache_dir(path)
+    with tempfile.NamedTemporaryFile(dir=directorio, suffix='.part', delete=False) as tmp:
+        pass
+    try:
+        if limiter is not None:
+            limiter.acquire()
+        download(file_id, tmp.name, url=url)
+        return _registrar(directorio, name, tmp.name, file_id=file_id), True
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+
+def store_dta(name, ruta, path=None):
+    """ registra en el caché una base .dta obtenida por otra vía (por ejemplo un zip del CEDLAS)
+    :param name: clave con la que se guarda, por ejemplo 'bra07'
+    :param ruta: ruta al archivo .dta
+    :param path: directorio del caché (ver cache_dir)
+    :return: ruta al archivo dentro del caché
+    """
+    return _registrar(cache_dir(path), name, ruta, mover=False)
+
+
+def parquet_path(ruta_dta, path=None, convert_categoricals=False):
+    """ convierte una única vez un archivo .dta a Parquet y devuelve la ruta del resultado
+    :param ruta_dta: ruta al archivo .dta
+    :param path: directorio del caché (ver cache_dir)
+    :param convert_categoricals: se pasa a pd.read_stata al convertir
+    :return: ruta al archivo .parquet, identificado por el hash del .dta de origen
+    """
+    directorio = os.path.join(cache_dir(path), 'parquet')
+    os.makedirs(directorio, exist_ok=True)
+    digest = os.path.splitext(os.path.basename(ruta_dta))[0]
+    if os.path.dirname(os.path.abspath(ruta_dta)) != os.path.join(cache_dir(path), 'objetos'):
+        digest = sha256(ruta_dta)
+    sufijo = '-cat' if convert_categoricals else ''
+    destino = os.path.join(directorio, f'{digest}{sufijo}.parquet')
+    if not os.path.exists(destino):
+        # read_stata conserva los tipos de Stata (int8, int16, float32), que Parquet mantiene
+        df = pd.read_stata(ruta_dta, convert_categoricals=convert_categoricals)
+        with tempfile.NamedTemporaryFile(dir=directorio, suffix='.part', delete=False) as tmp:
+            pass
+        try:
+            df.to_parquet(tmp.name, engine='pyarrow', index=False)
+            os.replace(tmp.name, destino)
+        finally:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+    return destino
+
+
+def memory_mb(df):
+    """ memoria que ocupa un dataframe, en megabytes """
+    return df.memory_usage(deep=True).sum()/2**20
+
+
+def _entero(valores):
+    """ tipo entero más chico que representa valores (None si no son enteros o hay faltantes) """
+    if len(valores) == 0 or np.isnan(valores).any() or not np.all(valores == np.round(valores)):
+        return None
+    for tipo in (np.int8, np.int16, np.int32):
+        info = np.iinfo(tipo)
+        if info.min <= valores.min() and valores.max() <= info.max:
+            return tipo
+    return None
+
+
+def compact(df, schema=SCHEMA):
+    """ reduce los tipos de las columnas según un perfil
+    :param df: dataframe leído de una encuesta
+    :param schema: diccionario {columna: rol}; los códigos ('code') pasan a int8/int16 (o float32 si
+                   tienen faltantes), el ponderador ('weight') a int32 si es entero o a float32, y los
+                   ingresos ('income') se guardan en float64. Las demás columnas no se modifican
+    :return: dataframe con los nuevos tipos
+    """
+    tipos = {}
+    for col, rol in schema.items():
+        if col not in df.columns or not pd.api.types.is_numeric_dtype(df[col]) or \
+                isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        valores = df[col].to_numpy(dtype=float)
+        if rol == 'income':
+            tipos[col] = np.float64
+        elif rol == 'code':
+            tipos[col] = _entero(valores) or np.float32
+        elif rol == 'weight':
+            tipos[col] = np.int32 if _entero(valores) is not None else np.float32
+        else:
+            raise ValueError(f"rol desconocido para {col}: {rol} (tiene que ser 'code', 'weight' o 'income')")
+    return df.astype({col: tipo for col, tipo in tipos.items() if df[col].dtype != tipo})
+
+
+def memory_report(frames):
+    """ memoria de cada base antes y después de reducir sus tipos
+    :param frames: diccionario {clave: dataframe} devuelto por read_surveys u open_surveys con schema
+                   (en el almacén por columnas, la memoria corresponde a la base completa guardada)
+    :return: dataframe con filas, mb_antes, mb_despues y ahorro (proporción de memoria liberada)
+    """
+    filas = {}
+    for name, df in frames.items():
+        actual = memory_mb(df)
+        antes, despues = df.attrs.get('memoria_mb', (actual, actual))
+        filas[name] = {'filas': len(df), 'mb_antes': antes, 'mb_despues': despues, 'ahorro': 1 - despues/antes}
+    reporte = pd.DataFrame.from_dict(filas, orient='index')
+    reporte.loc['Total'] = [reporte['filas'].sum(), reporte['mb_antes'].sum(), reporte['mb_despues'].sum(),
+                            1 - reporte['mb_despues'].sum()/reporte['mb_antes'].sum()]
+    return reporte.astype({'filas': int})
+
+
+def _origen(name, file_id=None, path=None, offline=None, limiter=None, url=DRIVE_URL):
+    """ ruta del .dta de una base: desde el caché o, si se indica file_id, descargándola si hace falta """
+    if file_id is None:
+        ruta = cached_path(name, path)
+        if ruta is None:
+            raise FileNotFoundError(f'{name} no se encuentra en el caché {cache_dir(path)}')
+        return ruta, False
+    return fetch_dta(name, file_id, path=path, offline=offline, limiter=limiter, url=url)
+
+
+def read_survey(name, file_id=None, columns=None, path=None, offline=None, convert_categoricals=False,
+                limiter=None, url=DRIVE_URL, schema=None):
+    """ lee una base del catálogo desde su copia columnar, leyendo sólo las columnas pedidas
+    :param name: clave del catálogo, por ejemplo 'mexico_06'
+    :param file_id: identificador en Google Drive (sólo necesario si la base no está en el caché)
+    :param columns: lista de columnas a leer; si es None se leen todas
+    :param path: directorio del caché (ver cache_dir)
+    :param offline: si es True nunca se descarga (por defecto se lee APENDICE_OFFLINE)
+    :param convert_categoricals: se pasa a pd.read_stata en la conversión
+    :param limiter: TokenBucket que se consulta antes de descargar (opcional)
+    :param url: prefijo de la dirección de descarga
+    :param schema: perfil de tipos que se aplica al leer (por ejemplo datos.SCHEMA, ver compact); la memoria
+                   antes y después queda en df.attrs['memoria_mb']
+    :return: tupla con el dataframe y un booleano que indica si hubo descarga
+    """
+    ruta, descargado = _origen(name, file_id, path=path, offline=offline, limiter=limiter, url=url)
+    destino = parquet_path(ruta, path=path, convert_categoricals=convert_categoricals)
+    df = pd.read_parquet(destino, columns=columns)
+    if schema is not None:
+        antes = memory_mb(df)
+        df = compact(df, schema)
+        df.attrs['memoria_mb'] = (antes, memory_mb(df))
+    return df, descargado
+
+
+class TokenBucket():
+    """ limitador de velocidad compartido entre hilos
+    :param rate: consultas permitidas por segundo (0.25 equivale a una cada 4 segundos)
+    :param capacity: cantidad máxima de consultas que pueden hacerse en ráfaga
+    """
+    def __init__(self, rate, capacity=1):
+        if rate <= 0 or capacity < 1:
+            raise ValueError('rate debe ser positivo y capacity al menos 1')
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ bloquea hasta que haya una ficha disponible y la consume """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last)*self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens)/self.rate
+            time.sleep(espera)
+
+
+def read_surveys(catalog, columns=None, path=None, offline=None, convert_categoricals=False,
+                 workers=4, rate=0.25, capacity=1, url=DRIVE_URL, schema=None):
+    """ carga varias bases en paralelo, con un límite de concurrencia y de velocidad de descarga
+    :param catalog: diccionario {clave: identificador en Google Drive} con las bases a cargar
+    :param columns: lista de columnas a leer en cada base; si es None se leen todas
+    :param path: directorio del caché (ver cache_dir)
+    :param offline: si es True nunca se descarga (por defecto se lee APENDICE_OFFLINE)
+    :param convert_categoricals: se pasa a pd.read_stata en la conversión
+    :param workers: cantidad máxima de bases que se descargan o leen a la vez
+    :param rate: descargas por segundo permitidas (las lecturas desde el caché no consumen fichas)
+    :param capacity: descargas que pueden iniciarse en ráfaga
+    :param url: prefijo de la dirección de descarga (permite apuntar a un servidor local)
+    :param schema: perfil de tipos que se aplica a cada base al leerla (ver compact y memory_report)
+    :return: diccionario {clave: dataframe} en el mismo orden que catalog
+    """
+    limiter = TokenBucket(rate, capacity)
+
+    def cargar(name):
+        return read_survey(name, catalog[name], columns=columns, path=path, offline=offline,
+                           convert_categoricals=convert_categoricals, limiter=limiter, url=url,
+                           schema=schema)[0]
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+        futuros = {name: pool.submit(cargar, name) for name in catalog}
+        return {name: futuro.result() for name, futuro in futuros.items()}
+
+
+def columns_dir(name, path=None):
+    """ directorio del almacén por columnas de una base (un archivo .npy por columna) """
+    return os.path.join(cache_dir(path), 'columnas', name)
+
+
+def _manifiesto(directorio):
+    ruta = os.path.join(directorio, 'columnas.json')
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def store_columns(name, file_id=None, path=None, offline=None, limiter=None, url=DRIVE_URL, schema=None):
+    """ guarda cada columna de una base como un archivo .npy, una única vez
+    :param name: clave del catálogo, por ejemplo 'mexico_06'
+    :param file_id: identificador en Google Drive (sólo necesario si la base no está en el caché)
+    :param path: directorio del caché (ver cache_dir)
+    :param offline: si es True nunca se descarga (por defecto se lee APENDICE_OFFLINE)
+    :param limiter: TokenBucket que se consulta antes de descargar (opcional)
+    :param url: prefijo de la dirección de descarga
+    :param schema: perfil de tipos con el que se guardan las columnas (ver compact)
+    :return: manifiesto con las filas, el tipo de cada columna y la memoria antes y después del perfil
+    """
+    directorio = columns_dir(name, path)
+    manifiesto = _manifiesto(directorio)
+    entrada = _leer_indice(cache_dir(path)).get(name)
+    # se reutiliza si corresponde a la misma versión de la base y al mismo perfil de tipos, sin releer el .dta
+    if manifiesto is not None and entrada is not None and manifiesto['sha256'] == entrada['sha256'] \
+            and manifiesto['schema'] == schema:
+        return manifiesto
+    ruta = _origen(name, file_id, path=path, offline=offline, limiter=limiter, url=url)[0]
+    df = pd.read_parquet(parquet_path(ruta, path=path))
+    antes = memory_mb(df)
+    if schema is not None:
+        df = compact(df, schema)
+    os.makedirs(os.path.dirname(directorio), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(directorio), suffix='.part')
+    try:
+        tipos = {}
+        for col in df.columns:
+            valores = df[col].to_numpy()
+            if valores.dtype == object:
+                valores = df[col].astype(str).to_numpy(dtype=str)
+            np.save(os.path.join(tmp, f'{col}.npy'), valores, allow_pickle=False)
+            tipos[col] = valores.dtype.str
+        manifiesto = {'sha256': os.path.splitext(os.path.basename(ruta))[0], 'schema': schema, 'filas': len(df),
+                      'columnas': tipos, 'memoria_mb': [antes, memory_mb(df)]}
+        with open(os.path.join(tmp, 'columnas.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=1)
+        if os.path.exists(directorio):
+            shutil.rmtree(directorio)
+        os.replace(tmp, directorio)
+    finally:
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+    return manifiesto
+
+
+def open_survey(name, columns=None, file_id=None, path=None, offline=None, limiter=None, url=DRIVE_URL,
+                schema=None):
+    """ abre una base del almacén por columnas como un dataframe mapeado en memoria
+    Las columnas no se leen al abrir: cada una es una vista (np.load con mmap_mode='c') del archivo
+    .npy, y el sistema operativo trae a memoria sólo las páginas que se usan. Las modificaciones
+    quedan en memoria y nunca se escriben en el archivo.
+    :param name: clave del catálogo, por ejemplo 'mexico_06'
+    :param columns: lista de columnas a abrir; si es None se abren todas
+    :param file_id: identificador en Google Drive (sólo necesario si la base no está en el caché)
+    :param path: directorio del caché (ver cache_dir)
+    :param offline: si es True nunca se descarga (por defecto se lee APENDICE_OFFLINE)
+    :param limiter: TokenBucket que se consulta antes de descargar (opcional)
+    :param url: prefijo de la dirección de descarga
+    :param schema: perfil de tipos del almacén (ver compact); si cambia, las columnas se vuelven a guardar
+    :return: dataframe cuyas columnas son vistas de los archivos
+    """
+    manifiesto = store_columns(name, file_id, path=path, offline=offline, limiter=limiter, url=url, schema=schema)
+    columnas = list(manifiesto['columnas']) if columns is None else list(columns)
+    faltantes = [c for c in columnas if c not in manifiesto['columnas']]
+    if faltantes:
+        raise KeyError(f'{name} no tiene las columnas {faltantes}')
+    directorio = columns_dir(name, path)
+    df = pd.DataFrame({c: np.load(os.path.join(directorio, f'{c}.npy'), mmap_mode='c') for c in columnas},
+                      copy=False)
+    df.attrs['memoria_mb'] = tuple(manifiesto['memoria_mb'])
+    return df
+
+
+def open_surveys(catalog, columns=None, path=None, offline=None, workers=4, rate=0.25, capacity=1,
+                 url=DRIVE_URL, schema=None):
+    """ abre varias bases del almacén por columnas; las que faltan se descargan y guardan en paralelo
+    :param catalog: diccionario {clave: identificador en Google Drive} con las bases a abrir
+    :param columns: lista de columnas a abrir en cada base; si es None se abren todas
+    :param path: directorio del caché (ver cache_dir)
+    :param offline: si es True nunca se descarga (por defecto se lee APENDICE_OFFLINE)
+    :param workers: cantidad máxima de bases que se descargan o guardan a la vez
+    :param rate: descargas por segundo permitidas
+    :param capacity: descargas que pueden iniciarse en ráfaga
+    :param url: prefijo de la dirección de descarga
+    :param schema: perfil de tipos del almacén (ver compact)
+    :return: diccionario {clave: dataframe mapeado en memoria} en el mismo orden que catalog
+    """
+    limiter = TokenBucket(rate, capacity)
+
+    def abrir(name):
+        return open_survey(name, columns, catalog[name], path=path, offline=offline, limiter=limiter, url=url,
+                           schema=schema)
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+        futuros = {name: pool.submit(abrir, name) for name in catalog}
+        return {name: futuro.result() for name, futuro in futuros.items()}
@@ -0,0 +1,81 @@
+""" Índices de desigualdad ponderados
+
+El coeficiente de Gini se obtiene del área bajo la curva de Lorenz, a partir de las
+mismas variables acumuladas (shrpop y shrinc) que construye distribucion.lorenz(), por
+lo que sólo requiere ordenar la base una vez. Los índices de Theil, de entropía generalizada
+y de Atkinson se calculan con sumas ponderadas sobre los ingresos positivos.
+Se importa desde los notebooks con `import desigualdad`.
+"""
+import numpy as np
+import pandas as pd
+
+import distribucion as dist
+
+
+def gini_from_lorenz(shrpop, shrinc):
+    """ coeficiente de Gini a partir de una curva de Lorenz ya ordenada
+    :param shrpop: proporción acumulada de población (creciente, termina en 1)
+    :param shrinc: proporción acumulada de ingreso correspondiente
+    :return: coeficiente de Gini (1 menos dos veces el área bajo la curva)
+    """
+    p = np.concatenate([[0], np.asarray(shrpop, dtype=float)])
+    L = np.concatenate([[0], np.asarray(shrinc, dtype=float)])
+    return 1 - np.sum(np.diff(p)*(L[1:] + L[:-1]))
+
+
+def inequality(data, x, weight=None, by=None, alphas=(-1, 2), epsilons=(0.5, 1, 2)):
+    """ Gini, Theil, entropía generalizada y Atkinson, por grupo, en una sola llamada
+    :param data: dataframe con las variables, o diccionario {pais: dataframe} para comparar bases;
+                 en ese caso se agrega la clave 'pais' al agrupamiento
+    :param x: nombre de la variable de ingreso
+    :param weight: nombre del ponderador (opcional)
+    :param by: nombre o lista de nombres de las variables de agrupamiento (opcional)
+    :param alphas: parámetros de la familia de entropía generalizada GE(α), además de Theil T y L
+    :param epsilons: parámetros de aversión a la desigualdad del índice de Atkinson
+    :return: dataframe con un índice por columna y un grupo por fila
+    """
+    by = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    if isinstance(data, dict):
+        columnas = by + [x] + ([] if weight is None else [weight])
+        data = pd.concat({k: v[columnas] for k, v in data.items()}, names=['pais']).reset_index(level='pais')
+        by = ['pais'] + by
+    curvas = dist.lorenz(data, x, weight=weight, by=by or None)
+    w = pd.Series(1.0, index=curvas.index) if weight is None else curvas[weight].astype(float)
+    claves = [curvas[b] for b in by]
+
+    def sumar(df):
+        return df.groupby(claves, sort=False).sum() if by else df.sum().to_frame().T
+
+    # Gini: área de los trapecios bajo la curva de Lorenz de cada grupo
+    previo = curvas.groupby(claves, sort=False)['shrinc'].shift(fill_value=0) if by else curvas['shrinc'].shift(fill_value=0)
+    total_w = w.groupby(claves, sort=False).transform('sum') if by else w.sum()
+    resultado = pd.DataFrame({'gini': 1 - sumar(pd.DataFrame({'t': w/total_w*(curvas['shrinc'] + previo)}))['t']})
+
+    # familia de entropía generalizada y Atkinson, sobre ingresos positivos
+    positivos = curvas[x] > 0
+    wp = w[positivos]
+    xp = curvas.loc[positivos, x].astype(float)
+    clp = [c[positivos] for c in claves]
+    media = (wp*xp).groupby(clp, sort=False).transform('sum')/wp.groupby(clp, sort=False).transform('sum') if by \
+        else np.sum(wp*xp)/np.sum(wp)
+    r = xp/media
+    lr = np.log(r)
+    terminos = {'_w': wp, 'theil_t': wp*r*lr, 'theil_l': -wp*lr}
+    for a in alphas:
+        if a == 0:
+            terminos[f'ge({a})'] = -wp*lr
+        elif a == 1:
+            terminos[f'ge({a})'] = wp*r*lr
+        else:
+            terminos[f'ge({a})'] = wp*(r**a - 1)/(a*(a - 1))
+    for e in epsilons:
+        terminos[f'atkinson({e})'] = wp*lr if e == 1 else wp*r**(1 - e)
+    sumas = pd.DataFrame(terminos)
+    sumas = sumas.groupby(clp, sort=False).sum() if by else sumas.sum().to_frame().T
+    promedios = sumas.drop(columns='_w').div(sumas['_w'], axis=0)
+    for e in epsilons:
+        col = f'atkinson({e})'
+        promedios[col] = 1 - (np.exp(promedios[col]) if e == 1 else promedios[col]**(1/(1 - e)))
+    if not by:
+        resultado.index = promedios.index
+    return resultado.join(promedios)
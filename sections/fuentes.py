@@ -0,0 +1,120 @@
+""" Descomposición del ingreso por fuentes
+
+Las fuentes de ingreso de una base (laboral, jubilaciones, capital, transferencias y
+otros) se apilan una sola vez en una matriz (observaciones x fuentes) con los faltantes
+en cero, de modo que los totales ponderados de todas las fuentes son un único producto
+pondera @ M. Sobre la misma matriz se calculan las participaciones por cuantil o grupo y
+la descomposición del coeficiente de Gini por fuentes de Lerman y Yitzhaki (1985), que
+coincide con la descomposición natural de Shorrocks (1982) para el Gini.
+Se importa desde los notebooks con `import fuentes`.
+"""
+import numpy as np
+import pandas as pd
+
+import distribucion as dist
+import paralelo
+
+SOURCES = ['ila', 'ijubi', 'icap', 'itran', 'ionl']
+
+
+def source_matrix(data, sources=SOURCES):
+    """ matriz (observaciones x fuentes) de ingresos, con los faltantes reemplazados por cero """
+    return np.nan_to_num(data[list(sources)].to_numpy(dtype=float))
+
+
+def _codigos(data, M, weight, by=None, quantiles=None, x=None):
+    """ código de grupo de cada observación y etiquetas de los grupos """
+    if quantiles is not None:
+        valores = M.sum(axis=1) if x is None else data[x].to_numpy(dtype=float)
+        codigo = dist.quantile_groups(valores, quantiles, weights=data[weight]) - 1
+        return codigo, pd.RangeIndex(1, quantiles + 1, name='cuantil')
+    if by is not None:
+        codigo, etiquetas = pd.factorize(data[by], sort=True)
+        return codigo, pd.Index(etiquetas, name=by)
+    return np.zeros(len(data), dtype=np.int64), pd.Index(['Total'], name='grupo')
+
+
+def source_shares(catalog, sources=SOURCES, weight='pondera', by=None, quantiles=None, x=None):
+    """ participación de cada fuente en el ingreso total, por país y opcionalmente por grupo o cuantil
+    :param catalog: dataframe o diccionario {pais: dataframe}
+    :param sources: lista de columnas con las fuentes de ingreso
+    :param weight: nombre del ponderador
+    :param by: nombre de la variable de agrupamiento (opcional)
+    :param quantiles: cantidad de cuantiles (opcional); se ordena según x o, si es None, según la suma de las fuentes
+    :param x: variable con la que se construyen los cuantiles, por ejemplo 'ipcf'
+    :return: dataframe con una columna por fuente y una fila por país (y grupo); las participaciones suman 1
+    """
+    bases = catalog if isinstance(catalog, dict) else {'Total': catalog}
+    partes = {}
+    for name, df in bases.items():
+        M = source_matrix(df, sources)
+        w = df[weight].to_numpy(dtype=float)
+        if by is None and quantiles is None:
+            # un solo producto matricial para todas las fuentes
+            totales = (w @ M)[None, :]
+            etiquetas = pd.Index(['Total'], name='grupo')
+        else:
+            codigo, etiquetas = _codigos(df, M, weight, by=by, quantiles=quantiles, x=x)
+            totales = np.column_stack([np.bincount(codigo, weights=w*M[:, k], minlength=len(etiquetas))
+                                       for k in range(M.shape[1])])
+        partes[name] = pd.DataFrame(totales/totales.sum(axis=1, keepdims=True), index=etiquetas, columns=list(sources))
+    resultado = pd.concat(partes, names=['pais'])
+    return resultado.droplevel(-1) if by is None and quantiles is None else resultado
+
+
+def _rango(y, w):
+    """ distribución acumulada ponderada en el punto medio de cada valor (los empates comparten rango) """
+    orden = np.argsort(y, kind='stable')
+    ys, ws = y[orden], w[orden]
+    inicio = np.concatenate([[0], np.flatnonzero(np.diff(ys)) + 1])
+    peso_valor = np.add.reduceat(ws, inicio)
+    previo = np.concatenate([[0], np.cumsum(peso_valor)[:-1]])
+    F = np.empty(len(y))
+    F[orden] = np.repeat((previo + peso_valor/2)/ws.sum(), np.diff(np.concatenate([inicio, [len(y)]])))
+    return F
+
+
+def _cov(a, b, w):
+    ma, mb = np.sum(w*a)/w.sum(), np.sum(w*b)/w.sum()
+    return np.sum(w*(a - ma)*(b - mb))/w.sum()
+
+
+def _descomponer(df, sources=SOURCES, weight='pondera'):
+    """ descomposición del Gini por fuentes de una base (ver gini_decomposition) """
+    M = source_matrix(df, sources)
+    w = df[weight].to_numpy(dtype=float)
+    y = M.sum(axis=1)
+    F = _rango(y, w)
+    medias = (w @ M)/w.sum()
+    S = medias/medias.sum()
+    positivas = medias > 0
+    G_k = np.full(M.shape[1], np.nan)
+    G_k[positivas] = [2*_cov(M[:, k], _rango(M[:, k], w), w)/medias[k] for k in np.flatnonzero(positivas)]
+    # contribución de cada fuente: S_k·G_k·R_k = 2·cov(y_k, F)/media de y
+    # (todas las covarianzas con un solo producto: cov(y_k, F) = E[w·(F - media de F)·y_k])
+    contribucion = 2*((w*(F - np.sum(w*F)/w.sum())) @ M)/w.sum()/medias.sum()
+    gini = contribucion.sum()
+    R_k = np.divide(contribucion, S*G_k, out=np.full(M.shape[1], np.nan), where=positivas)
+    resultado = pd.DataFrame({'participacion': S, 'gini': G_k, 'correlacion': R_k,
+                              'contribucion': contribucion,
+                              'contribucion_relativa': contribucion/gini,
+                              'elasticidad': contribucion/gini - S},
+                             index=pd.Index(list(sources), name='fuente'))
+    resultado.loc['total'] = [1.0, gini, 1.0, gini, 1.0, 0.0]
+    return resultado
+
+
+def gini_decomposition(catalog, sources=SOURCES, weight='pondera', workers=1):
+    """ descomposición del Gini del ingreso total por fuentes (Lerman y Yitzhaki), para varios países
+    G = suma_k S_k·G_k·R_k, con S_k la participación de la fuente, G_k su Gini y R_k la
+    correlación de Gini entre la fuente y el ingreso total.
+    :param catalog: dataframe o diccionario {pais: dataframe}
+    :param sources: lista de columnas con las fuentes de ingreso (el total es su suma)
+    :param weight: nombre del ponderador
+    :param workers: procesos que evalúan países en paralelo (ver paralelo.map_countries)
+    :return: dataframe indexado por (pais, fuente) con participacion, gini, correlacion, contribucion,
+             contribucion_relativa y elasticidad (efecto de un cambio marginal de la fuente sobre el Gini)
+    """
+    bases = catalog if isinstance(catalog, dict) else {'Total': catalog}
+    return paralelo.map_countries(_descomponer, bases, columns=list(sources) + [weight], workers=workers,
+                                  sources=list(sources), weight=weight)
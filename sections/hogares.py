@@ -0,0 +1,168 @@
+""" Estructura de hogares calculada una sola vez por base
+
+Varios ejercicios del capítulo 3 (tamaño del hogar, microsimulación de impuestos y
+transferencias) necesitan identificar el primer miembro de cada hogar y la cantidad de
+integrantes. En lugar de ordenar por *id* y agrupar en cada celda, HouseholdIndex ordena
+una vez y guarda los desplazamientos (offsets) de cada hogar en la base ordenada, al
+estilo de una matriz dispersa CSR. Cualquier reducción por hogar (suma, conteo, primer
+valor) es luego un np.add.reduceat de costo lineal, y la distribución de hogares por
+tamaño se obtiene con np.clip y np.bincount sobre esos conteos.
+Se importa desde los notebooks con `import hogares`.
+"""
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import paralelo
+
+# índices ya construidos, por base y variable de hogar; se liberan junto con el dataframe
+_CACHE = {}
+
+
+class HouseholdIndex():
+    """ índice de hogares de una base
+    :param ids: identificador del hogar de cada observación (en el orden de la base)
+    """
+    def __init__(self, ids):
+        ids = np.asarray(ids)
+        # orden estable: dentro de cada hogar se respeta el orden original de la base
+        self.order = np.argsort(ids, kind='stable')
+        ordenados = ids[self.order]
+        cortes = np.flatnonzero(ordenados[1:] != ordenados[:-1]) + 1
+        self.offsets = np.concatenate([[0], cortes, [len(ids)]]) if len(ids) else np.zeros(1, dtype=np.int64)
+        self.ids = ordenados[self.offsets[:-1]]
+        # hogar (0, ..., n_hogares - 1) de cada observación, en el orden de la base
+        self.codes = np.empty(len(ids), dtype=np.int64)
+        self.codes[self.order] = np.repeat(np.arange(len(self.ids)), np.diff(self.offsets))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def sizes(self):
+        """ cantidad de miembros de cada hogar """
+        return np.diff(self.offsets)
+
+    @property
+    def head(self):
+        """ máscara (en el orden de la base) del primer miembro de cada hogar, como tag_hogar """
+        mascara = np.zeros(len(self.order), dtype=bool)
+        mascara[self.order[self.offsets[:-1]]] = True
+        return mascara
+
+    @property
+    def members(self):
+        """ cantidad de miembros del hogar de cada observación, como miembros """
+        return self.sizes[self.codes]
+
+    def reduce(self, values, how='sum'):
+        """ reducción por hogar de una variable
+        :param values: vector (o serie) en el orden de la base
+        :param how: 'sum' (ignora faltantes), 'count' (valores no faltantes) o 'first'
+        :return: vector con un valor por hogar, en el orden de self.ids
+        """
+        valores = np.asarray(values)[self.order]
+        if how == 'first':
+            return valores[self.offsets[:-1]]
+        if how not in ('sum', 'count'):
+            raise ValueError("how tiene que ser 'sum', 'count' o 'first'")
+        if len(self) == 0:
+            return np.zeros(0)
+        valores = valores.astype(float)
+        faltante = np.isnan(valores)
+        if how == 'count':
+            return np.add.reduceat((~faltante).astype(np.int64), self.offsets[:-1])
+        return np.add.reduceat(np.where(faltante, 0.0, valores), self.offsets[:-1])
+
+    def broadcast(self, values):
+        """ lleva un valor por hogar a cada una de sus observaciones (como groupby.transform) """
+        return np.asarray(values)[self.codes]
+
+
+def household_index(data, hh='id'):
+    """ índice de hogares de una base, construido la primera vez y reutilizado después
+    :param data: dataframe con la encuesta (no debe modificarse la variable hh luego de indexar)
+    :param hh: nombre del identificador del hogar
+    :return: HouseholdIndex
+    """
+    clave = (id(data), hh)
+    guardado = _CACHE.get(clave)
+    if guardado is not None and guardado[0]() is data and len(guardado[1].order) == len(data):
+        return guardado[1]
+    indice = HouseholdIndex(data[hh].to_numpy())
+    _CACHE[clave] = (weakref.ref(data, lambda ref, clave=clave: _olvidar(clave, ref)), indice)
+    return indice
+
+
+def _olvidar(clave, ref):
+    """ borra un índice del caché cuando se libera su dataframe """
+    if _CACHE.get(clave, (None,))[0] is ref:
+        del _CACHE[clave]
+
+
+def household_reduce(data, x, how='sum', hh='id', broadcast=False):
+    """ reducción por hogar de una columna usando el índice guardado
+    :param data: dataframe con la encuesta
+    :param x: nombre de la variable a reducir
+    :param how: 'sum', 'count' o 'first'
+    :param hh: nombre del identificador del hogar
+    :param broadcast: si es True se devuelve una serie alineada con data (como groupby.transform)
+    :return: serie indexada por hogar, o alineada con data si broadcast es True
+    """
+    indice = household_index(data, hh)
+    resultado = indice.reduce(data[x], how=how)
+    if broadcast:
+        return pd.Series(indice.broadcast(resultado), index=data.index, name=x)
+    return pd.Series(resultado, index=pd.Index(indice.ids, name=hh), name=x)
+
+
+def household_distribution(data, weight='pondera', hh='id', top=6, counts=None):
+    """ distribución ponderada de hogares según su tamaño y otras características de composición
+    :param data: dataframe con la encuesta (una fila por persona)
+    :param weight: nombre del ponderador; se toma el del primer miembro de cada hogar
+    :param hh: nombre del identificador del hogar
+    :param top: valor en el que se truncan los conteos (6 representa "6 o más")
+    :param counts: diccionario {nombre: columna} con otras variables a contar por hogar; la columna
+                   puede ser un nombre (variable 0/1, como 'ocupado') o una función que recibe data y
+                   devuelve una serie booleana
+    :return: serie con el porcentaje de hogares, indexada por (variable, valor)
+    """
+    indice = household_index(data, hh)
+    pesos = indice.reduce(data[weight].to_numpy(dtype=float), how='first')
+    conteos = {'tamanio': indice.sizes}
+    for nombre, columna in (counts or {}).items():
+        miembros = columna(data) if callable(columna) else data[columna]
+        conteos[nombre] = indice.reduce(np.asarray(miembros, dtype=float), how='sum').astype(np.int64)
+    partes = {}
+    for nombre, conteo in conteos.items():
+        minimo = 1 if nombre == 'tamanio' else 0
+        # np.clip agrupa en top los hogares con top o más miembros
+        total = np.bincount(np.clip(conteo, 0, top), weights=pesos, minlength=top + 1)
+        partes[nombre] = pd.Series(total[minimo:]/pesos.sum()*100, index=pd.RangeIndex(minimo, top + 1))
+    return pd.concat(partes, names=['variable', 'valor'])
+
+
+def composition(catalog, weight='pondera', hh='id', top=6, counts=None, workers=1):
+    """ household_distribution para varias bases a la vez
+    :param catalog: diccionario {pais: dataframe}
+    :param weight: nombre del ponderador
+    :param hh: nombre del identificador del hogar
+    :param top: valor en el que se truncan los conteos
+    :param counts: otras variables a contar por hogar (ver household_distribution); las funciones se
+                   evalúan en el proceso principal y los procesos reciben sólo su resultado
+    :param workers: procesos que evalúan países en paralelo (ver paralelo.map_countries)
+    :return: dataframe indexado por (variable, valor) con una columna por país
+    """
+    counts = counts or {}
+    # sólo se comparten las columnas que usa household_distribution
+    columnas = list(dict.fromkeys([hh, weight] + [c for c in counts.values() if not callable(c)]))
+    calculadas = {f'_{nombre}': columna for nombre, columna in counts.items() if callable(columna)}
+    if calculadas:
+        catalog = {name: df[columnas].assign(**{col: np.asarray(fn(df), dtype=float)
+                                                for col, fn in calculadas.items()})
+                   for name, df in catalog.items()}
+        counts = {nombre: f'_{nombre}' if callable(columna) else columna for nombre, columna in counts.items()}
+    resultado = paralelo.map_countries(household_distribution, catalog, columns=columnas + list(calculadas),
+                                       workers=workers, weight=weight, hh=hh, top=top, counts=counts)
+    return resultado.T.rename_axis(columns=None)
@@ -0,0 +1,131 @@
+""" Microsimulación de impuestos y transferencias intrahogar
+
+El ejercicio del apartado 3.5 aplica un impuesto proporcional t sobre el ipcf de cada
+miembro y transfiere lo recaudado en el hogar a su primer miembro. Como
+
+    ipcf_star = ipcf - t·ipcf + t·(suma del ipcf del hogar)·jefe
+
+es lineal en t, la estructura del hogar (hogares.household_index) se calcula una sola vez por país y el ingreso
+simulado para un vector de alícuotas es una matriz (observaciones x alícuotas).
+Se importa desde los notebooks con `import microsimulacion`.
+"""
+import numpy as np
+import pandas as pd
+
+import hogares
+import paralelo
+
+
+def household_shift(data, x='ipcf', hh='id'):
+    """ cambio del ingreso por unidad de alícuota, calculado una sola vez
+    :param data: dataframe con la encuesta
+    :param x: nombre de la variable de ingreso
+    :param hh: nombre del identificador del hogar
+    :return: vector d tal que ipcf_star = ipcf + t·d, en el orden de data
+    """
+    valores = data[x].to_numpy(dtype=float)
+    indice = hogares.household_index(data, hh)
+    suma_hogar = indice.broadcast(indice.reduce(valores, how='sum'))
+    # el primer miembro de cada hogar (en el orden de la base) recibe la transferencia
+    return np.where(indice.head, suma_hogar, 0.0) - valores
+
+
+def tax_transfer(data, rates, x='ipcf', hh='id'):
+    """ ingreso simulado para un vector de alícuotas
+    :param data: dataframe con la encuesta
+    :param rates: alícuota o vector de alícuotas del impuesto
+    :param x: nombre de la variable de ingreso
+    :param hh: nombre del identificador del hogar
+    :return: matriz (observaciones x alícuotas) con ipcf_star
+    """
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    d = household_shift(data, x=x, hh=hh)
+    return data[x].to_numpy(dtype=float)[:, None] + d[:, None]*rates[None, :]
+
+
+def _filas_hasta(acumulado, total, corte):
+    """ cantidad de filas con acumulado/total <= corte en cada columna (acumulado no decreciente)
+    Búsqueda binaria simultánea en todas las columnas: lee unas pocas filas en lugar de recorrer
+    la matriz.
+    """
+    columnas = np.arange(acumulado.shape[1])
+    lo = np.zeros(len(columnas), dtype=np.int64)
+    hi = np.full(len(columnas), acumulado.shape[0], dtype=np.int64)
+    while (lo < hi).any():
+        activa = lo < hi
+        medio = np.minimum((lo + hi)//2, acumulado.shape[0] - 1)
+        dentro = acumulado[medio, columnas]/total <= corte
+        lo = np.where(activa & dentro, medio + 1, lo)
+        hi = np.where(activa & ~dentro, medio, hi)
+    return lo
+
+
+def _suma_hasta(acumulado, k):
+    """ suma de las primeras k[j] filas de cada columna j, a partir de las sumas acumuladas """
+    return np.where(k > 0, acumulado[np.maximum(k - 1, 0), np.arange(acumulado.shape[1])], 0.0)
+
+
+def quintile_ratio_columns(X, weights):
+    """ cociente de quintiles extremos (como ratq51) para cada columna de ingresos o de ponderadores
+    También lo usa remuestreo.quintile_ratio, donde los ingresos son fijos y cada columna de
+    ponderadores es una réplica.
+    :param X: vector de ingresos o matriz (observaciones x escenarios) de ingresos
+    :param weights: vector de ponderadores (común a todos los escenarios) o matriz (observaciones x escenarios)
+    :return: vector con el cociente entre la media del quintil 5 y la del quintil 1 de cada columna
+    """
+    X = np.asarray(X, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    X = X[:, None] if X.ndim == 1 else X
+    weights = weights[:, None] if weights.ndim == 1 else weights
+    if X.shape[1] == 1:
+        # ingresos comunes: se ordena una sola vez
+        orden = np.argsort(X[:, 0], kind='stable')
+        Xs, Ws = X[orden], weights[orden]
+    else:
+        orden = np.argsort(X, axis=0, kind='stable')
+        Xs = np.take_along_axis(X, orden, axis=0)
+        Ws = weights[orden, 0] if weights.shape[1] == 1 else np.take_along_axis(weights, orden, axis=0)
+    # como en ratq51, sólo cuentan los ingresos positivos; los faltantes se anulan en ambas
+    # matrices, porque NaN*0 sigue siendo NaN (Xs y Ws ya son copias y se modifican en el lugar)
+    valido = np.isfinite(Xs) & (Xs > 0)
+    Ws *= valido
+    Xs[~valido] = 0.0
+    # shrpop es no decreciente en cada columna: el quintil 1 son las primeras k1 filas y el
+    # quintil 5 las que siguen a las primeras k5, así que las sumas salen de las sumas acumuladas
+    # sin armar una matriz por quintil
+    acum_xw = Xs*Ws
+    np.cumsum(acum_xw, axis=0, out=acum_xw)
+    acum_w = np.cumsum(Ws, axis=0, out=Ws)
+    total_w, total_xw = acum_w[-1], acum_xw[-1]
+    k1 = _filas_hasta(acum_w, total_w, 0.2)
+    k5 = _filas_hasta(acum_w, total_w, 0.8)
+    media_q1 = _suma_hasta(acum_xw, k1)/_suma_hasta(acum_w, k1)
+    media_q5 = (total_xw - _suma_hasta(acum_xw, k5))/(total_w - _suma_hasta(acum_w, k5))
+    return media_q5/media_q1
+
+
+def _ratios(df, rates, x='ipcf', weight='pondera', hh='id', block=25):
+    """ cociente de quintiles de una base para cada alícuota, evaluando block alícuotas a la vez """
+    valores = df[x].to_numpy(dtype=float)
+    d = household_shift(df, x=x, hh=hh)
+    pesos = df[weight].to_numpy(dtype=float)
+    ratios = np.concatenate([quintile_ratio_columns(valores[:, None] + d[:, None]*r[None, :], pesos)
+                             for r in np.array_split(rates, max(1, int(np.ceil(len(rates)/block))))])
+    return pd.DataFrame({'alicuota': rates, 'ratq51': ratios})
+
+
+def simulate(catalog, rates, x='ipcf', weight='pondera', hh='id', block=25, workers=1):
+    """ cociente de quintiles tras el impuesto-transferencia para cada país y alícuota
+    :param catalog: diccionario {pais: dataframe}
+    :param rates: vector de alícuotas
+    :param x: nombre de la variable de ingreso
+    :param weight: nombre del ponderador
+    :param hh: nombre del identificador del hogar
+    :param block: alícuotas que se evalúan juntas (acota la memoria a observaciones x block)
+    :param workers: procesos que evalúan países en paralelo (ver paralelo.map_countries)
+    :return: dataframe ordenado con las columnas pais, alicuota y ratq51
+    """
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    resultado = paralelo.map_countries(_ratios, catalog, columns=[x, weight, hh], workers=workers,
+                                       rates=rates, x=x, weight=weight, hh=hh, block=block)
+    return resultado.reset_index(level='pais').reset_index(drop=True)
@@ -0,0 +1,127 @@
+""" Ejecución en paralelo de un análisis por país
+
+map_countries() aplica una función a cada base de un catálogo en procesos separados.
+Las columnas no se envían como dataframes serializados: cada una se copia una vez a un
+bloque de memoria compartida (multiprocessing.shared_memory) y el proceso que la usa la
+lee sin copiarla. Las columnas que vienen de un archivo mapeado en memoria cuyo contenido es
+el del archivo (np.load con mmap_mode='r' o 'r+') se vuelven a abrir directamente desde él; las
+de un mapeo copy-on-write como el de datos.open_surveys (mmap_mode='c') pueden tener cambios que sólo
+existen en memoria, por lo que se copian a memoria compartida como las demás. Los resultados
+se devuelven en el mismo orden que el catálogo, en un único dataframe indexado por país.
+Se importa desde los notebooks con `import paralelo`.
+"""
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+def _archivo(valores):
+    """ memmap que respalda completo a un vector y refleja su contenido (o None si no lo hay)
+    Un mapeo copy-on-write (modo 'c') puede tener modificaciones que sólo existen en este proceso.
+    """
+    base = valores
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    if base is None or getattr(base, 'filename', None) is None or base.mode == 'c' \
+            or base.shape != valores.shape \
+            or base.dtype != valores.dtype or not np.shares_memory(base, valores) \
+            or base.__array_interface__['data'][0] != valores.__array_interface__['data'][0]:
+        return None
+    return base
+
+
+def _empaquetar(df, columns, bloques):
+    """ descripción de cada columna para reconstruirla en otro proceso sin serializar sus datos """
+    specs = []
+    for col in columns:
+        valores = df[col].to_numpy()
+        mapa = _archivo(valores)
+        if mapa is not None:
+            specs.append((col, 'archivo', (mapa.filename, mapa.offset, valores.dtype.str, valores.shape)))
+        elif valores.dtype.kind in 'biuf' and valores.nbytes > 0:
+            shm = shared_memory.SharedMemory(create=True, size=valores.nbytes)
+            bloques.append(shm)
+            np.ndarray(valores.shape, dtype=valores.dtype, buffer=shm.buf)[:] = valores
+            specs.append((col, 'compartida', (shm.name, valores.dtype.str, valores.shape)))
+        else:
+            # textos, categorías o columnas vacías: se envían serializadas
+            specs.append((col, 'valores', df[col]))
+    return specs
+
+
+def _ejecutar(fn, specs, kwargs):
+    """ arma el dataframe en el proceso de trabajo, aplica fn y devuelve el resultado serializado """
+    bloques = []
+    try:
+        columnas = {}
+        for col, tipo, info in specs:
+            if tipo == 'archivo':
+                nombre, offset, dtype, shape = info
+                columnas[col] = np.memmap(nombre, dtype=dtype, mode='r', offset=offset, shape=shape)
+            elif tipo == 'compartida':
+                nombre, dtype, shape = info
+                shm = shared_memory.SharedMemory(name=nombre)
+                bloques.append(shm)
+                # vista de sólo lectura: todos los procesos leen el mismo bloque
+                columnas[col] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                columnas[col].flags.writeable = False
+            else:
+                columnas[col] = info.to_numpy()
+        df = pd.DataFrame(columnas, copy=False)
+        # el resultado se serializa antes de liberar la memoria compartida de la que podría depender
+        resultado = pickle.dumps(fn(df, **kwargs))
+        del df, columnas
+        return resultado
+    finally:
+        for shm in bloques:
+            shm.close()
+
+
+def _ordenar(resultados):
+    """ une los resultados de cada país en un dataframe indexado por país """
+    valores = list(resultados.values())
+    if all(isinstance(v, pd.DataFrame) for v in valores):
+        return pd.concat(resultados, names=['pais'])
+    if all(isinstance(v, pd.Series) for v in valores):
+        return pd.DataFrame(resultados).T.rename_axis('pais')
+    return pd.DataFrame({'valor': valores}, index=pd.Index(list(resultados), name='pais'))
+
+
+def map_countries(fn, catalog, columns=None, workers=None, context=None, **kwargs):
+    """ aplica fn a cada base del catálogo en procesos separados, compartiendo las columnas en memoria
+    :param fn: función que recibe un dataframe (y kwargs) y devuelve un número, una serie o un dataframe;
+               puede agregar columnas pero no modificar en el lugar las columnas compartidas. Tiene
+               que poder ubicarse por su nombre: una función de un módulo o, con context='fork', del
+               propio notebook (no una lambda)
+    :param catalog: diccionario {pais: dataframe}
+    :param columns: columnas que necesita fn (por defecto todas); sólo esas se comparten
+    :param workers: cantidad de procesos; por defecto la cantidad de CPUs. Con workers=1 se ejecuta
+                    en el proceso actual, sin memoria compartida
+    :param context: método de inicio de los procesos ('fork', 'spawn' o 'forkserver'); por defecto el
+                    de la plataforma. 'fork' sólo existe en Linux y macOS, y Python lo desaconseja si el
+                    proceso ya tiene hilos en ejecución
+    :param kwargs: argumentos adicionales para fn
+    :return: dataframe indexado por país (en el orden de catalog): una columna 'valor' si fn devuelve
+             números, una fila por país si devuelve series, o índice (pais, ...) si devuelve dataframes
+    """
+    workers = os.cpu_count() if workers is None else max(1, int(workers))
+    if workers == 1 or len(catalog) <= 1:
+        return _ordenar({name: fn(df if columns is None else df[list(columns)], **kwargs)
+                         for name, df in catalog.items()})
+    bloques = []
+    try:
+        specs = {name: _empaquetar(df, list(df.columns) if columns is None else list(columns), bloques)
+                 for name, df in catalog.items()}
+        with ProcessPoolExecutor(max_workers=min(workers, len(catalog)), mp_context=multiprocessing.get_context(context)) as pool:
+            futuros = {name: pool.submit(_ejecutar, fn, specs[name], kwargs) for name in catalog}
+            resultados = {name: pickle.loads(futuro.result()) for name, futuro in futuros.items()}
+    finally:
+        for shm in bloques:
+            shm.close()
+            shm.unlink()
+    return _ordenar(resultados)
@@ -0,0 +1,102 @@
+""" Curvas de Pareto y estimación del índice de la cola superior
+
+La curva de Pareto grafica log(1 - F(x)) contra log(x). La proporción acumulada de población
+de cada grupo se obtiene con el mismo ordenamiento y las mismas sumas acumuladas
+(groupby.cumsum y groupby.transform) que distribucion.lorenz(), sin un apply por región.
+El índice de la cola (alfa) se estima para todos los grupos a la vez, con el estimador de
+Hill ponderado o con una regresión por MCO sobre el p% más rico de cada grupo.
+Se importa desde los notebooks con `import pareto`.
+"""
+import numpy as np
+import pandas as pd
+
+import distribucion as dist
+
+
+def pareto_curve(data, x, weight=None, by=None, offset=0.0):
+    """ variables de la curva de Pareto de cada grupo
+    :param data: dataframe con las variables
+    :param x: nombre de la variable de ingreso
+    :param weight: nombre del ponderador (opcional)
+    :param by: nombre o lista de nombres de las variables de agrupamiento (opcional)
+    :param offset: constante que se suma a x antes del logaritmo (1 evita log(0) con ingresos nulos)
+    :return: dataframe ordenado por grupo y por x con shrpop, l<x> = log(x + offset) y lpareto = log(1 - shrpop)
+    """
+    curva = dist.lorenz(data, x, weight=weight, by=by).drop(columns=['shrinc', 'glorenz'])
+    with np.errstate(divide='ignore'):
+        curva[f'l{x}'] = np.log(curva[x] + offset)
+        # la última observación de cada grupo tiene shrpop = 1 y lpareto = -inf
+        curva['lpareto'] = np.log(1 - curva['shrpop'])
+    return curva
+
+
+def tail_index(data, x, weight=None, by=None, top=0.05, method='hill'):
+    """ índice de Pareto (alfa) de la cola superior de cada grupo, en una sola llamada
+    :param data: dataframe con las variables
+    :param x: nombre de la variable de ingreso
+    :param weight: nombre del ponderador (opcional)
+    :param by: nombre o lista de nombres de las variables de agrupamiento (opcional)
+    :param top: proporción de la población de cada grupo que forma la cola (0.05 es el 5% más rico)
+    :param method: 'hill' (estimador de Hill ponderado) u 'ols' (pendiente de lpareto sobre log(x))
+    :return: dataframe con alfa, el umbral de la cola y sus observaciones, por grupo
+    """
+    if method not in ('hill', 'ols'):
+        raise ValueError("method tiene que ser 'hill' u 'ols'")
+    by = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    curva = dist.lorenz(data[data[x] > 0], x, weight=weight, by=by or None)
+    w = pd.Series(1.0, index=curva.index) if weight is None else curva[weight].astype(float)
+    claves = [curva[b] for b in by]
+    total = w.groupby(claves, sort=False).transform('sum') if by else w.sum()
+    # una observación está en la cola si toda su población queda por encima del percentil 1 - top
+    previo = curva['shrpop'] - w/total
+    cola = previo >= 1 - top - 1e-12
+    lx = np.log(curva[x])
+    cuerpo = lx.where(~cola)
+    umbral = cuerpo.groupby(claves, sort=False).transform('max') if by else cuerpo.max()
+
+    wc = w[cola]
+    lxc = lx[cola]
+    clc = [c[cola] for c in claves]
+    if method == 'hill':
+        terminos = pd.DataFrame({'w': wc, 'wl': wc*(lxc - (umbral[cola] if by else umbral))})
+    else:
+        # proporción por encima de cada observación, evaluada en el punto medio de su peso
+        ly = np.log(1 - (curva['shrpop'] - w/(2*total)))[cola]
+        terminos = pd.DataFrame({'w': wc, 'wx': wc*lxc, 'wy': wc*ly, 'wxx': wc*lxc**2, 'wxy': wc*lxc*ly})
+    terminos['n'] = 1
+    sumas = terminos.groupby(clc, sort=False).sum() if by else terminos.sum().to_frame().T
+    if method == 'hill':
+        alfa = sumas['w']/sumas['wl']
+    else:
+        cov = sumas['wxy']/sumas['w'] - sumas['wx']*sumas['wy']/sumas['w']**2
+        var = sumas['wxx']/sumas['w'] - (sumas['wx']/sumas['w'])**2
+        alfa = -cov/var
+    umbrales = np.exp(umbral.groupby(claves, sort=False).first() if by else pd.Series(umbral, index=sumas.index))
+    return pd.DataFrame({'alfa': alfa, 'umbral': umbrales.reindex(sumas.index), 'n': sumas['n'].astype(int)})
+
+
+def thin(curve, x, y, by=None, points=2000):
+    """ reduce la cantidad de puntos a graficar de cada curva a un presupuesto fijo
+    La mitad de los puntos se reparte de manera equiespaciada sobre el eje x y la otra mitad
+    sobre el eje y, de modo que se conserva tanto el cuerpo de la distribución como la cola.
+    :param curve: dataframe ordenado por grupo y con x creciente dentro de cada grupo (ver pareto_curve)
+    :param x: nombre de la variable del eje horizontal
+    :param y: nombre de la variable del eje vertical (monótona dentro de cada grupo)
+    :param by: nombre de la variable de agrupamiento (opcional)
+    :param points: cantidad máxima de puntos por grupo
+    :return: subconjunto de las filas de curve, en el mismo orden
+    """
+    grupos = curve.groupby(by, sort=False).indices.values() if by is not None else [np.arange(len(curve))]
+    elegidos = []
+    for filas in grupos:
+        finitos = np.isfinite(curve[x].to_numpy()[filas]) & np.isfinite(curve[y].to_numpy()[filas])
+        posiciones = filas[finitos]
+        if len(posiciones) > points:
+            indices = [[0, len(posiciones) - 1]]
+            for col in (x, y):
+                valores = curve[col].to_numpy()[posiciones]
+                v = valores if valores[-1] >= valores[0] else -valores
+                indices.append(np.minimum(np.searchsorted(v, np.linspace(v[0], v[-1], (points - 2)//2)), len(v) - 1))
+            posiciones = posiciones[np.unique(np.concatenate(indices))]
+        elegidos.append(posiciones)
+    return curve.iloc[np.sort(np.concatenate(elegidos))] if elegidos else curve.iloc[:0]
@@ -0,0 +1,175 @@
+""" Errores estándar por bootstrap con ponderadores replicados
+
+Los remuestreos respetan el diseño de la encuesta: dentro de cada estrato se sortean
+conglomerados (hogares, identificados por *id*) con reposición, según el bootstrap
+reescalado de Rao y Wu. Cada réplica se representa como una columna de una matriz de
+ponderadores, de modo que un estadístico se evalúa sobre un bloque de réplicas con
+operaciones vectorizadas de numpy en lugar de un bucle por réplica.
+Se importa desde los notebooks con `import remuestreo`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import microsimulacion
+
+
+def _multiplicadores(estrato, n_conglomerados, reps, rng):
+    """ multiplicadores de Rao-Wu por conglomerado (filas) y réplica (columnas) """
+    mult = np.ones((n_conglomerados, reps))
+    for h in np.unique(estrato):
+        miembros = np.flatnonzero(estrato == h)
+        n_h = len(miembros)
+        if n_h < 2:
+            continue  # un estrato con un solo conglomerado no aporta variabilidad
+        # n_h - 1 sorteos con reposición por réplica, contados con un solo bincount (equivale a una
+        # multinomial con probabilidades iguales, mucho más rápido cuando hay muchos conglomerados)
+        sorteos = rng.integers(0, n_h, size=(reps, n_h - 1)) + n_h*np.arange(reps)[:, None]
+        conteos = np.bincount(sorteos.ravel(), minlength=reps*n_h).reshape(reps, n_h).T
+        mult[miembros] = conteos*n_h/(n_h - 1)
+    return mult
+
+
+def _estructura(data, cluster, strata):
+    """ código de conglomerado de cada observación y estrato de cada conglomerado """
+    estrato_obs = np.zeros(len(data), dtype=np.int64) if strata is None else pd.factorize(data[strata])[0]
+    conglomerado_obs = np.arange(len(data)) if cluster is None else data[cluster].to_numpy()
+    # los conglomerados se identifican dentro de cada estrato
+    codigo, unicos = pd.factorize(pd.MultiIndex.from_arrays([estrato_obs, conglomerado_obs]))
+    return codigo, unicos.get_level_values(0).to_numpy()
+
+
+def replicate_weights(data, weight, cluster=None, strata=None, reps=1000, seed=None):
+    """ matriz de ponderadores replicados (observaciones x réplicas)
+    :param data: dataframe con la encuesta
+    :param weight: nombre del ponderador
+    :param cluster: nombre de la variable de conglomerado (por ejemplo 'id'); si es None cada fila es un conglomerado
+    :param strata: nombre de la variable de estrato (por ejemplo 'estrato'; opcional)
+    :param reps: cantidad de réplicas
+    :param seed: semilla o generador de numpy para reproducir los resultados
+    :return: matriz numpy de dimensión (len(data), reps)
+    """
+    codigo, estrato = _estructura(data, cluster, strata)
+    mult = _multiplicadores(estrato, len(estrato), reps, np.random.default_rng(seed))
+    return data[weight].to_numpy(dtype=float)[:, None]*mult[codigo]
+
+
+def mean_of(x, domain=None):
+    """ estadístico: media ponderada de x, opcionalmente en un dominio (serie booleana o nombre de columna) """
+    def stat(data, W):
+        valores = data[x].to_numpy(dtype=float)
+        d = np.ones(len(data)) if domain is None else \
+            (data[domain] if isinstance(domain, str) else domain).to_numpy(dtype=float)
+        return (valores*d) @ W/(d @ W)
+    return stat
+
+
+def means_by(x, by):
+    """ estadístico: media ponderada de x en cada grupo de by (una fila por grupo y una columna por réplica)
+    Todos los grupos se evalúan sobre la misma matriz de réplicas, ordenando la base por grupo una
+    sola vez y sumando cada tramo con np.add.reduceat.
+    """
+    def stat(data, W):
+        codigo, grupos = pd.factorize(data[by], sort=True)
+        orden = np.argsort(codigo, kind='stable')
+        orden = orden[codigo[orden] >= 0]  # observaciones sin grupo
+        cortes = np.flatnonzero(np.diff(codigo[orden], prepend=-1))
+        Ws = W[orden]
+        totales = np.add.reduceat(data[x].to_numpy(dtype=float)[orden, None]*Ws, cortes, axis=0)
+        return pd.DataFrame(totales/np.add.reduceat(Ws, cortes, axis=0), index=pd.Index(grupos, name=by))
+    return stat
+
+
+def poverty_rate(x, line):
+    """ estadístico: tasa de pobreza (proporción ponderada con x < line) """
+    def stat(data, W):
+        pobre = (data[x].to_numpy(dtype=float) < line).astype(float)
+        return pobre @ W/W.sum(axis=0)
+    return stat
+
+
+def _ordenado(data, x, W):
+    """ x ordenado y las filas de W en ese orden; los ingresos faltantes quedan con ponderador nulo """
+    valores = data[x].to_numpy(dtype=float)
+    orden = np.argsort(valores, kind='stable')
+    valores, Ws = valores[orden], W[orden]
+    faltante = ~np.isfinite(valores)
+    if faltante.any():
+        Ws[faltante] = 0.0
+        valores = np.where(faltante, 0.0, valores)
+    return valores, Ws
+
+
+def quintile_ratio(x):
+    """ estadístico: cociente entre el ingreso medio del quintil 5 y el del quintil 1 (como ratq51)
+    Ordena los ingresos una sola vez por bloque de réplicas y descarta los faltantes; las medias de
+    los quintiles salen de dos sumas acumuladas. Ver bootstrap para el costo esperado.
+    """
+    def stat(data, W):
+        return microsimulacion.quintile_ratio_columns(data[x].to_numpy(dtype=float), W)
+    return stat
+
+
+def gini_of(x):
+    """ estadístico: coeficiente de Gini a partir de la curva de Lorenz de cada réplica
+    Como shrinc previo = shrinc - x·w/(suma x·w), la suma de los trapecios
+    suma w·(shrinc + shrinc previo) es 2·suma w·shrinc - suma x·w²/(suma x·w), de modo que basta
+    una suma acumulada por bloque de réplicas. Los ingresos faltantes se descartan.
+    """
+    def stat(data, W):
+        valores, Ws = _ordenado(data, x, W)
+        acumulado = valores[:, None]*Ws
+        np.cumsum(acumulado, axis=0, out=acumulado)
+        total, total_x = Ws.sum(axis=0), acumulado[-1]
+        area = 2*np.einsum('ij,ij->j', Ws, acumulado) - np.einsum('i,ij,ij->j', valores, Ws, Ws)
+        return 1 - area/(total*total_x)
+    return stat
+
+
+def bootstrap(data, statistic, weight, cluster=None, strata=None, reps=1000, seed=None,
+              block=50, workers=1, alpha=0.05):
+    """ error estándar por bootstrap de cualquier estadístico vectorizado
+    :param data: dataframe con la encuesta
+    :param statistic: función que recibe (data, W), con W una matriz de ponderadores
+                      (observaciones x réplicas), y devuelve un valor por columna, o una matriz
+                      (estadísticos x réplicas) para estimar varios a la vez con las mismas réplicas;
+                      ver mean_of, means_by, poverty_rate, quintile_ratio y gini_of
+    :param weight: nombre del ponderador
+    :param cluster: nombre de la variable de conglomerado (por ejemplo 'id')
+    :param strata: nombre de la variable de estrato (opcional)
+    :param reps: cantidad de réplicas
+    :param seed: semilla para reproducir los resultados
+    :param block: réplicas que se evalúan juntas (acota la memoria a len(data) x block)
+    :param workers: hilos que evalúan bloques en paralelo (numpy libera el GIL en estas operaciones)
+    :param alpha: nivel para el intervalo de confianza por percentiles
+    :return: serie con la estimación, el error estándar y el intervalo de confianza, o un dataframe
+             con una fila por estadístico si statistic devuelve una matriz
+    El costo crece con len(data) x reps: cada bloque arma y recorre unas pocas veces una matriz de
+    len(data) x block. Como referencia, con 400.000 observaciones y 1000 réplicas (workers=1),
+    quintile_ratio y gini_of tardan unos 9 segundos, de los cuales unos 3 son el armado de los
+    ponderadores replicados.
+    """
+    estimacion = statistic(data, data[weight].to_numpy(dtype=float)[:, None])
+    tamanios = [min(block, reps - i) for i in range(0, reps, block)]
+    semillas = np.random.SeedSequence(seed).spawn(len(tamanios))
+
+    codigo, estrato = _estructura(data, cluster, strata)
+    pesos = data[weight].to_numpy(dtype=float)[:, None]
+
+    def evaluar(args):
+        tamanio, semilla = args
+        W = pesos*_multiplicadores(estrato, len(estrato), tamanio, np.random.default_rng(semilla))[codigo]
+        return np.asarray(statistic(data, W), dtype=float)
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+        replicas = np.concatenate(list(pool.map(evaluar, zip(tamanios, semillas))), axis=-1)
+    resumen = {'estimacion': np.asarray(estimacion, dtype=float)[..., 0],
+               'error_estandar': replicas.std(ddof=1, axis=-1),
+               'ic_inf': np.quantile(replicas, alpha/2, axis=-1),
+               'ic_sup': np.quantile(replicas, 1 - alpha/2, axis=-1),
+               'replicas': reps}
+    if replicas.ndim == 1:
+        return pd.Series({k: float(v) for k, v in resumen.items()})
+    indice = estimacion.index if isinstance(estimacion, pd.DataFrame) else pd.RangeIndex(replicas.shape[0])
+    return pd.DataFrame(resumen, index=indice)